@@ -0,0 +1,378 @@
+"""Poll envoy admin stats during a run and report per-wasm-plugin costs.
+
+Every interval /stats/prometheus is fetched and split by its `# TYPE` lines:
+counters are turned into rates and deltas, gauges (memory, active VMs, ...)
+are kept as values, and request-duration histograms give latency percentiles.
+Memory, wasm and per-plugin stats are tracked over time. A time series (JSON
+lines) and a summary with counter deltas, gauge ranges and latency
+percentiles per plugin are written at the end.
+
+  python3 .devcontainer/gen_config.py key-auth ai-proxy --admin-port 8082 --output chain.yaml
+  python3 .devcontainer/envoy_stats.py --admin http://127.0.0.1:8082 --config chain.yaml \
+      --duration 60 --output-dir stats-run
+
+Snapshots can be saved with --record DIR and replayed later with --replay DIR
+instead of polling a live envoy. --expect compares the summary with a JSON
+file and exits non-zero on a mismatch, which is how the fixture in
+testdata/envoy_stats is checked:
+
+  python3 .devcontainer/envoy_stats.py --replay .devcontainer/testdata/envoy_stats \
+      --plugin key-auth --plugin ai-proxy --expect .devcontainer/testdata/envoy_stats/expected.json
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import sys
+import time
+import urllib.request
+
+PROM_LINE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)')
+PROM_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+PROM_TYPE_RE = re.compile(r'^#\s*TYPE\s+(\S+)\s+(\w+)')
+PLUGIN_FILE_RE = re.compile(r'filename:\s*\./extensions/([^/\s]+)/main\.wasm')
+
+
+def fetch(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read().decode("utf-8")
+
+
+def prometheus_name(name):
+    """Sanitize a name the way envoy does for /stats/prometheus (key-auth -> key_auth)."""
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def parse_prometheus(text):
+    """Parse /stats/prometheus into {"counters", "gauges", "histograms"} using its `# TYPE` lines.
+
+    Counters and gauges map `name{labels}` to a value, histograms map it to
+    {"buckets": [(le, cumulative)], "sum", "count"}. Untyped samples count as gauges.
+    """
+    types = {}
+    metrics = {"counters": {}, "gauges": {}, "histograms": {}}
+    histograms = metrics["histograms"]
+    for line in text.splitlines():
+        if not line:
+            continue
+        if line.startswith("#"):
+            match = PROM_TYPE_RE.match(line)
+            if match:
+                types[match.group(1)] = match.group(2)
+            continue
+        match = PROM_LINE_RE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        labels = dict(PROM_LABEL_RE.findall(labels or ""))
+        try:
+            value = float(value)
+        except ValueError:
+            continue
+        base, suffix = name, None
+        for candidate in ("_bucket", "_sum", "_count"):
+            if name.endswith(candidate) and types.get(name[:-len(candidate)]) == "histogram":
+                base, suffix = name[:-len(candidate)], candidate
+                break
+        le = labels.pop("le", None) if suffix else None
+        key = base + ("{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}" if labels else "")
+        if suffix is None:
+            kind = "counters" if types.get(name) == "counter" else "gauges"
+            metrics[kind][key] = value
+            continue
+        histogram = histograms.setdefault(key, {"buckets": [], "sum": 0.0, "count": 0.0})
+        if suffix == "_bucket" and le is not None:
+            histogram["buckets"].append((math.inf if le == "+Inf" else float(le), value))
+        elif suffix == "_sum":
+            histogram["sum"] = value
+        else:
+            histogram["count"] = value
+    for histogram in histograms.values():
+        histogram["buckets"].sort()
+    metrics["histograms"] = {key: h for key, h in histograms.items() if h["buckets"]}
+    return metrics
+
+
+def histogram_delta(after, before):
+    if before is None:
+        return after
+    previous = dict(before["buckets"])
+    return {
+        "buckets": [(le, count - previous.get(le, 0.0)) for le, count in after["buckets"]],
+        "sum": after["sum"] - before["sum"],
+        "count": after["count"] - before["count"],
+    }
+
+
+def histogram_quantile(histogram, q):
+    """Estimate a quantile from cumulative buckets, interpolating linearly inside a bucket."""
+    buckets = histogram["buckets"]
+    total = buckets[-1][1] if buckets else 0
+    if total <= 0:
+        return None
+    target = q * total
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= target:
+            if math.isinf(bound):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (target - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def describe_histogram(histogram):
+    count = histogram["buckets"][-1][1] if histogram["buckets"] else 0
+    return {
+        "count": int(count),
+        "mean": histogram["sum"] / count if count else None,
+        "p50": histogram_quantile(histogram, 0.5),
+        "p90": histogram_quantile(histogram, 0.9),
+        "p99": histogram_quantile(histogram, 0.99),
+    }
+
+
+def plugins_from_config(path):
+    """Plugin names of the wasm filters in a gen_config.py output."""
+    with open(path, "r", encoding="utf-8") as f:
+        return PLUGIN_FILE_RE.findall(f.read())
+
+
+def plugin_pattern(plugin):
+    """Match a plugin name as a whole word, either as is (label values) or sanitized (metric names)."""
+    return re.compile(r'(?<![\w-])' + re.escape(plugin) + r'(?![\w-])'
+                      r'|(?:^|_)' + re.escape(prometheus_name(plugin)) + r'(?=_|\{|$)')
+
+
+class Collector:
+    def __init__(self, plugins, memory_re, watch_re):
+        self.plugins = plugins
+        # Longer names first, so ai_proxy_foo_* goes to ai-proxy-foo rather than ai-proxy
+        self.plugin_patterns = [(plugin, plugin_pattern(plugin))
+                                for plugin in sorted(plugins, key=len, reverse=True)]
+        self.memory_re = re.compile(memory_re)
+        self.watch_re = re.compile(watch_re)
+        self.first = None
+        self.previous = None
+        self.gauges = {}
+        self.samples = 0
+
+    def plugin_of(self, name):
+        for plugin, pattern in self.plugin_patterns:
+            if pattern.search(name):
+                return plugin
+        return None
+
+    def tracked(self, name):
+        return self.memory_re.search(name) or self.watch_re.search(name) or self.plugin_of(name)
+
+    def add(self, timestamp, metrics):
+        """Fold one parse_prometheus snapshot in and return its time series record."""
+        snapshot = dict(metrics, t=timestamp)
+        record = {"t": timestamp, "gauges": {}, "rates": {}, "latency": {}}
+        for name, value in metrics["gauges"].items():
+            if not self.tracked(name):
+                continue
+            record["gauges"][name] = value
+            entry = self.gauges.setdefault(name, {"first": value, "min": value, "max": value})
+            entry["last"] = value
+            entry["min"] = min(entry["min"], value)
+            entry["max"] = max(entry["max"], value)
+
+        if self.previous is not None:
+            dt = timestamp - self.previous["t"]
+            for name, value in metrics["counters"].items():
+                if not self.tracked(name):
+                    continue
+                delta = value - self.previous["counters"].get(name, 0.0)
+                if delta and dt > 0:
+                    record["rates"][name] = delta / dt
+            for key, histogram in metrics["histograms"].items():
+                delta = histogram_delta(histogram, self.previous["histograms"].get(key))
+                if delta["buckets"] and delta["buckets"][-1][1] > 0:
+                    record["latency"][key] = describe_histogram(delta)
+
+        if self.first is None:
+            self.first = snapshot
+        self.previous = snapshot
+        self.samples += 1
+        return record
+
+    def summary(self):
+        if self.first is None:
+            return {"samples": 0}
+        first, last = self.first, self.previous
+        counters = {}
+        for name, value in last["counters"].items():
+            if not self.tracked(name):
+                continue
+            delta = value - first["counters"].get(name, 0.0)
+            if delta:
+                counters[name] = delta
+        latency = {}
+        for key, histogram in last["histograms"].items():
+            delta = histogram_delta(histogram, first["histograms"].get(key))
+            if delta["buckets"] and delta["buckets"][-1][1] > 0:
+                latency[key] = describe_histogram(delta)
+        gauges = {name: dict(entry, growth=entry["last"] - entry["first"]) for name, entry in self.gauges.items()}
+
+        plugins = {}
+        for plugin in self.plugins:
+            plugins[plugin] = {
+                "counters": {k: v for k, v in counters.items() if self.plugin_of(k) == plugin},
+                "gauges": {k: v for k, v in gauges.items() if self.plugin_of(k) == plugin},
+                "latency": {k: v for k, v in latency.items() if self.plugin_of(k) == plugin},
+            }
+        return {
+            "samples": self.samples,
+            "duration": last["t"] - first["t"],
+            "gauges": gauges,
+            "counters": counters,
+            "latency": latency,
+            "plugins": plugins,
+        }
+
+
+def check_expected(actual, expected, path="summary"):
+    """List the differences between a summary and the expected one; numbers compare approximately."""
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return [f"{path}: expected an object, got {actual!r}"]
+        problems = [f"{path}.{key}: unexpected" for key in actual if key not in expected]
+        for key, value in expected.items():
+            if key not in actual:
+                problems.append(f"{path}.{key}: missing")
+            else:
+                problems += check_expected(actual[key], value, f"{path}.{key}")
+        return problems
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        if not math.isclose(actual, expected, rel_tol=1e-6, abs_tol=1e-9):
+            return [f"{path}: expected {expected}, got {actual}"]
+        return []
+    if actual != expected:
+        return [f"{path}: expected {expected!r}, got {actual!r}"]
+    return []
+
+
+def live_snapshots(admin, interval, duration, timeout, record_dir):
+    start_time = time.time()
+    index = 0
+    while True:
+        tick = time.time()
+        prometheus_text = fetch(admin + "/stats/prometheus", timeout)
+        if record_dir:
+            prefix = os.path.join(record_dir, f"{index:05d}")
+            with open(prefix + ".prometheus.txt", "w", encoding="utf-8") as f:
+                f.write(prometheus_text)
+            with open(prefix + ".time", "w", encoding="utf-8") as f:
+                f.write(f"{tick - start_time}\n")
+        yield tick - start_time, prometheus_text
+        index += 1
+        if duration and time.time() - start_time >= duration:
+            return
+        time.sleep(max(0.0, interval - (time.time() - tick)))
+
+
+def replay_snapshots(replay_dir, interval):
+    """Yield recorded snapshots; without a .time file they are assumed `interval` apart."""
+    for index, prometheus_file in enumerate(sorted(glob.glob(os.path.join(replay_dir, "*.prometheus.txt")))):
+        prefix = prometheus_file[:-len(".prometheus.txt")]
+        timestamp = index * interval
+        if os.path.exists(prefix + ".time"):
+            with open(prefix + ".time", "r", encoding="utf-8") as f:
+                timestamp = float(f.read().strip())
+        with open(prometheus_file, "r", encoding="utf-8") as f:
+            yield timestamp, f.read()
+
+
+def fmt_ms(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def print_summary(summary, top):
+    print(f"{summary['samples']} samples over {summary.get('duration', 0):.1f}s")
+    for name, entry in sorted(summary.get("gauges", {}).items(), key=lambda item: -abs(item[1]["growth"]))[:top]:
+        print(f"gauge {name}: {entry['first']:.0f} -> {entry['last']:.0f} "
+              f"(max {entry['max']:.0f}, growth {entry['growth']:+.0f})")
+    for key, stats in summary.get("latency", {}).items():
+        print(f"latency {key}: n={stats['count']} p50={fmt_ms(stats['p50'])} "
+              f"p90={fmt_ms(stats['p90'])} p99={fmt_ms(stats['p99'])}")
+    for plugin, data in summary.get("plugins", {}).items():
+        counters = sorted(data["counters"].items(), key=lambda item: -abs(item[1]))[:top]
+        print(f"plugin {plugin}: " + (", ".join(f"{name}={value:+.0f}" for name, value in counters)
+                                      if counters else "no matching stats"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Envoy admin stats collector for wasm plugins")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--admin", default="http://127.0.0.1:8082", help="Envoy admin base URL")
+    source.add_argument("--replay", metavar="DIR", help="Replay snapshots recorded with --record instead of polling")
+    parser.add_argument("--record", metavar="DIR", help="Save every fetched snapshot to this directory")
+    parser.add_argument("--plugin", action="append", default=[], help="Plugin name to report on, may be repeated")
+    parser.add_argument("--config", help="Read plugin names from an envoy config written by gen_config.py")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds (default: until Ctrl-C)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Admin request timeout in seconds")
+    parser.add_argument("--memory-regex", default=r"memory|heap",
+                        help="Memory stats tracked besides those matching a plugin name (default: %(default)s)")
+    parser.add_argument("--watch-regex", default=r"wasm|downstream_rq_total|downstream_rq_xx",
+                        help="Other stats tracked besides those matching a plugin name (default: %(default)s)")
+    parser.add_argument("--output-dir", help="Write timeseries.jsonl and summary.json to this directory")
+    parser.add_argument("--top", type=int, default=10, help="Entries per section in the printed summary")
+    parser.add_argument("--expect", metavar="FILE",
+                        help="Compare the summary with this JSON file and exit 1 on a mismatch")
+    args = parser.parse_args()
+
+    plugins = list(args.plugin)
+    if args.config:
+        plugins += [name for name in plugins_from_config(args.config) if name not in plugins]
+    collector = Collector(plugins, args.memory_regex, args.watch_regex)
+
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    if args.replay:
+        snapshots = replay_snapshots(args.replay, args.interval)
+    else:
+        snapshots = live_snapshots(args.admin.rstrip("/"), args.interval, args.duration, args.timeout, args.record)
+
+    timeseries = None
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        timeseries = open(os.path.join(args.output_dir, "timeseries.jsonl"), "w", encoding="utf-8")
+    try:
+        for timestamp, prometheus_text in snapshots:
+            record = collector.add(timestamp, parse_prometheus(prometheus_text))
+            if timeseries:
+                timeseries.write(json.dumps(record) + "\n")
+                timeseries.flush()
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error polling envoy admin: {e}", file=sys.stderr)
+    finally:
+        if timeseries:
+            timeseries.close()
+
+    summary = collector.summary()
+    if args.output_dir:
+        with open(os.path.join(args.output_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    print_summary(summary, args.top)
+
+    if args.expect:
+        with open(args.expect, "r", encoding="utf-8") as f:
+            problems = check_expected(summary, json.load(f))
+        for problem in problems:
+            print(f"mismatch {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+        print(f"summary matches {args.expect}")
+
+
+if __name__ == "__main__":
+    main()
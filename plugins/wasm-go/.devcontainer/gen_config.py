@@ -1,13 +1,129 @@
+import argparse
+import ipaddress
 import json
-import sys
+import os
 
 
-plugin_name = sys.argv[1]
+def parse_plugin(spec):
+    """Parse `name` or `name=path/to/config.json` into (name, config).
 
-with open("extensions/"+plugin_name+"/config.json", "r") as f:
-    plugin_config = json.load(f)
+    Raises ValueError for an unknown plugin or a missing config file.
+    """
+    name, sep, config_path = spec.partition("=")
+    if not os.path.isdir("extensions/"+name):
+        raise ValueError(f"unknown plugin {name!r}: extensions/{name} not found")
+    if not sep:
+        config_path = "extensions/"+name+"/config.json"
+    if os.path.exists(config_path):
+        with open(config_path, "r") as f:
+            return name, json.load(f)
+    if sep:
+        raise ValueError(f"config file {config_path} not found")
+    return name, {}
 
-config = f'''static_resources:
+
+def parse_upstream(upstream):
+    """Split HOST:PORT, raising ValueError when either part is missing or the port is invalid."""
+    host, _, port = upstream.rpartition(":")
+    host = host.strip("[]")
+    if not host or not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"invalid upstream {upstream!r}, expected HOST:PORT")
+    return host, int(port)
+
+
+def instance_names(names):
+    """Name each filter after its plugin, numbering repeats: a, b, a -> a, b, a-2."""
+    seen = {}
+    instances = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        instances.append(name if seen[name] == 1 else f"{name}-{seen[name]}")
+    return instances
+
+
+def wasm_filter(instance, name, plugin_config, vm_id):
+    vm_id_line = f"\n                    vm_id: {json.dumps(vm_id)}" if vm_id else ""
+    # A JSON string is also a valid YAML double-quoted scalar, so no manual quoting is needed
+    return f'''          - name: {instance}
+            typed_config:
+              "@type": type.googleapis.com/udpa.type.v1.TypedStruct
+              type_url: type.googleapis.com/envoy.extensions.filters.http.wasm.v3.Wasm
+              value:
+                config:
+                  name: {instance}
+                  vm_config:
+                    runtime: envoy.wasm.runtime.v8{vm_id_line}
+                    code:
+                      local:
+                        filename: ./extensions/{name}/main.wasm
+                  configuration:
+                    "@type": "type.googleapis.com/google.protobuf.StringValue"
+                    value: {json.dumps(json.dumps(plugin_config))}
+'''
+
+
+def route(upstream):
+    if upstream:
+        return '''              - match:
+                  prefix: "/"
+                route:
+                  cluster: service-backend
+'''
+    return '''              - match:
+                  prefix: "/"
+                direct_response:
+                  status: 200
+                  body:
+                    inline_string: "hello world\\n"
+'''
+
+
+def clusters(upstream, connect_timeout):
+    if not upstream:
+        return ''
+    host, port = parse_upstream(upstream)
+    try:
+        ipaddress.ip_address(host)
+        discovery = "STATIC"
+    except ValueError:
+        discovery = "STRICT_DNS"
+    return f'''  clusters:
+  - name: service-backend
+    connect_timeout: {connect_timeout}
+    type: {discovery}
+    lb_policy: ROUND_ROBIN
+    load_assignment:
+      cluster_name: service-backend
+      endpoints:
+        - lb_endpoints:
+            - endpoint:
+                address:
+                  socket_address:
+                    address: {host}
+                    port_value: {port}
+'''
+
+
+def admin(admin_port):
+    if not admin_port:
+        return ''
+    return f'''admin:
+  address:
+    socket_address:
+      address: 0.0.0.0
+      port_value: {admin_port}
+'''
+
+
+def envoy_config(plugins, vm_ids, upstream, connect_timeout, admin_port):
+    """Render an envoy config running the plugins in order in front of the route.
+
+    vm_ids maps filter instance names (see instance_names) to their vm_id.
+    """
+    instances = instance_names([name for name, _ in plugins])
+    filters = ''.join(wasm_filter(instance, name, plugin_config, vm_ids.get(instance))
+                      for instance, (name, plugin_config) in zip(instances, plugins))
+    return f'''static_resources:
   listeners:
   - address:
       socket_address:
@@ -24,53 +140,67 @@ config = f'''static_resources:
             name: test
             virtual_hosts:
             - name: direct_response_service
-              domains: 
+              domains:
               - "*"
               routes:
-              - match:
-                  prefix: "/"
-                direct_response:
-                  status: 200
-                  body:
-                    inline_string: "hello world\\n"
-              # - match:
-              #     prefix: "/"
-              #   route:
-              #     cluster: service-backend
-          http_filters:
-          - name: {plugin_name}
-            typed_config:
-              "@type": type.googleapis.com/udpa.type.v1.TypedStruct
-              type_url: type.googleapis.com/envoy.extensions.filters.http.wasm.v3.Wasm
-              value:
-                config:
-                  name: wasmdemo
-                  vm_config:
-                    runtime: envoy.wasm.runtime.v8
-                    code:
-                      local:
-                        filename: ./extensions/{plugin_name}/main.wasm
-                  configuration:
-                    "@type": "type.googleapis.com/google.protobuf.StringValue"
-                    value: '{json.dumps(plugin_config)}'
-          - name: envoy.filters.http.router
+{route(upstream)}          http_filters:
+{filters}          - name: envoy.filters.http.router
             typed_config:
               '@type': type.googleapis.com/envoy.extensions.filters.http.router.v3.Router
-  # clusters:
-  # - name: service-backend
-  #   connect_timeout: 600s
-  #   type: STATIC
-  #   lb_policy: ROUND_ROBIN
-  #   load_assignment:
-  #     cluster_name: service-backend
-  #     endpoints:
-  #       - lb_endpoints:
-  #           - endpoint:
-  #               address:
-  #                 socket_address:
-  #                   address: 127.0.0.1
-  #                   port_value: 8000
-'''
+{clusters(upstream, connect_timeout)}{admin(admin_port)}'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a local envoy config for one plugin or a chain of plugins.")
+    parser.add_argument("plugins", nargs="+",
+                        help="Plugins in filter order, as NAME or NAME=CONFIG_JSON "
+                             "(default config: extensions/NAME/config.json); a plugin may be repeated "
+                             "with different configs")
+    parser.add_argument("--vm-id", choices=["shared", "separate"],
+                        help="Give every filter the same vm_id, or one vm_id per filter (default: unset). "
+                             "Envoy only shares a VM between filters running the same module, so "
+                             "shared matters for a plugin repeated in the chain, not across plugins")
+    parser.add_argument("--upstream", metavar="HOST:PORT",
+                        help="Route to this upstream cluster instead of a direct response")
+    parser.add_argument("--connect-timeout", default="600s", help="Upstream connect timeout")
+    parser.add_argument("--admin-port", type=int, help="Expose the envoy admin interface on this port")
+    parser.add_argument("--baseline", action="store_true",
+                        help="Also write a matching config without the wasm filters next to the output")
+    parser.add_argument("--output",
+                        help="Output file (default: extensions/NAME/config.yaml for one plugin, chain.yaml otherwise)")
+    args = parser.parse_args()
+
+    try:
+        plugins = [parse_plugin(spec) for spec in args.plugins]
+        if args.upstream:
+            parse_upstream(args.upstream)
+    except ValueError as e:
+        parser.error(str(e))
+    names = [name for name, _ in plugins]
+    instances = instance_names(names)
+    if args.vm_id == "shared":
+        vm_ids = {instance: "shared" for instance in instances}
+    elif args.vm_id == "separate":
+        vm_ids = {instance: instance for instance in instances}
+    else:
+        vm_ids = {}
+
+    output = args.output
+    if not output:
+        output = "extensions/"+names[0]+"/config.yaml" if len(names) == 1 else "chain.yaml"
+
+    config = envoy_config(plugins, vm_ids, args.upstream, args.connect_timeout, args.admin_port)
+    with open(output, "w") as f:
+        f.write(config)
+    print(f"wrote {output}: {' -> '.join(instances)}")
+
+    if args.baseline:
+        root, ext = os.path.splitext(output)
+        baseline_output = root + ".baseline" + (ext or ".yaml")
+        with open(baseline_output, "w") as f:
+            f.write(envoy_config([], {}, args.upstream, args.connect_timeout, args.admin_port))
+        print(f"wrote {baseline_output}: no wasm filters")
+
 
-with open("extensions/"+plugin_name+"/config.yaml", "w") as f:
-    f.write(config)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
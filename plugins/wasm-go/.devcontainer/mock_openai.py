@@ -0,0 +1,297 @@
+"""OpenAI-compatible mock upstream for offline, deterministic load tests.
+
+Speaks /v1/chat/completions (plain JSON and SSE streaming) and /v1/models
+with a configurable first-token delay and token rate, optional 429/5xx
+injection and canned or echoed answers. GET /mock/stats returns what it
+received, DELETE /mock/stats resets the counters.
+
+  python3 .devcontainer/mock_openai.py --port 8000 --first-token-ms 300 --tokens-per-sec 50
+  python3 .devcontainer/gen_config.py ai-proxy --upstream 127.0.0.1:8000
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN_RE = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]|\s*[^\s\u3400-\u9fff\uf900-\ufaff]+|\s+")
+DEFAULT_RESPONSE = "This is a mock response from the local OpenAI-compatible server."
+
+
+def tokenize(text):
+    """Split text into pseudo tokens: one per CJK character or per word with its leading space."""
+    return TOKEN_RE.findall(text or "")
+
+
+def message_text(message):
+    content = message.get("content")
+    if isinstance(content, list):
+        return "".join(part.get("text") or "" for part in content
+                       if isinstance(part, dict) and isinstance(part.get("text") or "", str))
+    return content if isinstance(content, str) else ""
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.data = {
+                "requests": 0,
+                "streamed": 0,
+                "status": {},
+                "models": {},
+                "bytes_in": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "in_flight": 0,
+                "max_in_flight": 0,
+            }
+
+    def begin(self, size):
+        with self.lock:
+            self.data["requests"] += 1
+            self.data["bytes_in"] += size
+            self.data["in_flight"] += 1
+            self.data["max_in_flight"] = max(self.data["max_in_flight"], self.data["in_flight"])
+
+    def end(self, status, model=None, stream=False, prompt_tokens=0, completion_tokens=0):
+        with self.lock:
+            self.data["in_flight"] -= 1
+            self.data["status"][str(status)] = self.data["status"].get(str(status), 0) + 1
+            if model is not None:
+                self.data["models"][model] = self.data["models"].get(model, 0) + 1
+            self.data["streamed"] += bool(stream)
+            self.data["prompt_tokens"] += prompt_tokens
+            self.data["completion_tokens"] += completion_tokens
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.data))
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "mock-openai"
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.startswith("/mock/stats"):
+            self.send_json(200, self.server.stats.snapshot())
+        elif self.path.rstrip("/").endswith("/models"):
+            models = [{"id": model, "object": "model", "owned_by": "mock"} for model in self.server.options.models]
+            self.send_json(200, {"object": "list", "data": models})
+        else:
+            self.send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_DELETE(self):
+        if self.path.startswith("/mock/stats"):
+            self.server.stats.reset()
+            self.send_json(200, self.server.stats.snapshot())
+        else:
+            self.send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        stats = self.server.stats
+        stats.begin(len(raw))
+        # Filled in by complete() before it answers, so the counters are right even if it fails
+        outcome = {"status": 500}
+        try:
+            self.complete(raw, outcome)
+        finally:
+            stats.end(**outcome)
+
+    def complete(self, raw, outcome):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            outcome["status"] = 404
+            self.send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        try:
+            request = json.loads(raw or b"{}")
+            messages = request["messages"]
+            if not isinstance(messages, list) or not messages or not all(isinstance(m, dict) for m in messages):
+                raise ValueError("messages must be a non-empty list of objects")
+            max_tokens = request.get("max_tokens") or request.get("max_completion_tokens")
+            if max_tokens is not None and (not isinstance(max_tokens, int) or isinstance(max_tokens, bool)
+                                           or max_tokens < 0):
+                raise ValueError("max_tokens must be a non-negative integer")
+            if not isinstance(request.get("stream_options") or {}, dict):
+                raise ValueError("stream_options must be an object")
+        except (ValueError, KeyError, TypeError) as e:
+            outcome["status"] = 400
+            self.send_json(400, {"error": {"message": f"invalid request: {e}", "type": "invalid_request_error"}})
+            return
+
+        options = self.server.options
+        model = request.get("model") or options.models[0]
+        stream = bool(request.get("stream"))
+        prompt_tokens = sum(len(tokenize(message_text(m))) for m in messages)
+        outcome.update(model=model, stream=stream, prompt_tokens=prompt_tokens)
+
+        injected = self.server.inject()
+        if injected == 429:
+            outcome["status"] = 429
+            self.send_json(429, {"error": {"message": "mock rate limit", "type": "rate_limit_error"}},
+                           {"Retry-After": str(options.retry_after)})
+            return
+        if injected == 500:
+            self.send_json(500, {"error": {"message": "mock server error", "type": "server_error"}})
+            return
+
+        tokens = tokenize(self.server.answer(messages))
+        if max_tokens:
+            tokens = tokens[:max_tokens]
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        completion_id = "chatcmpl-" + uuid.uuid4().hex
+        created = int(time.time())
+        outcome.update(status=200, completion_tokens=len(tokens))
+
+        if stream:
+            include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+            self.stream_completion(completion_id, created, model, tokens, usage, include_usage)
+        else:
+            time.sleep(options.first_token_ms / 1000 + self.server.token_interval * max(0, len(tokens) - 1))
+            self.send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens)}}],
+                "usage": usage,
+            })
+
+    def stream_completion(self, completion_id, created, model, tokens, usage, include_usage):
+        def event(choices, **extra):
+            payload = dict({"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                            "model": model, "choices": choices}, **extra)
+            return b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        time.sleep(self.server.options.first_token_ms / 1000)
+        self.write_chunk(event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]))
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.server.token_interval)
+            self.write_chunk(event([{"index": 0, "delta": {"content": token}, "finish_reason": None}]))
+        self.write_chunk(event([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if include_usage:
+            self.write_chunk(event([], usage=usage))
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, options):
+        super().__init__(address, MockHandler)
+        self.options = options
+        self.stats = Stats()
+        self.token_interval = 1.0 / options.tokens_per_sec if options.tokens_per_sec > 0 else 0.0
+        self.random = random.Random(options.seed)
+        self.random_lock = threading.Lock()
+        self.responses = itertools.cycle(options.responses)
+        self.responses_lock = threading.Lock()
+
+    def inject(self):
+        """Pick an injected status for this request, or None to answer normally."""
+        with self.random_lock:
+            roll = self.random.random()
+        if roll < self.options.rate_limit_rate:
+            return 429
+        if roll < self.options.rate_limit_rate + self.options.error_rate:
+            return 500
+        return None
+
+    def answer(self, messages):
+        if self.options.mode == "echo":
+            user_messages = [m for m in messages if m.get("role") == "user"]
+            return message_text(user_messages[-1] if user_messages else messages[-1])
+        with self.responses_lock:
+            return next(self.responses)
+
+
+def load_responses(path):
+    """Canned answers: one JSON string or {"content": ...} per line, or plain text lines."""
+    responses = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if line.startswith("{") or line.startswith('"'):
+                value = json.loads(line)
+                responses.append(value["content"] if isinstance(value, dict) else value)
+            else:
+                responses.append(line)
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock upstream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--mode", choices=["canned", "echo"], default="canned",
+                        help="Answer with canned responses or echo the last user message")
+    parser.add_argument("--response", action="append", help="Canned response, may be repeated")
+    parser.add_argument("--response-file", help="File of canned responses, one per line (text or JSON)")
+    parser.add_argument("--models", nargs="+", default=["mock-model"], help="Models listed by /v1/models")
+    parser.add_argument("--first-token-ms", type=float, default=0, help="Delay before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=0, help="Token rate after the first token, 0 for unlimited")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for error injection")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    options = parser.parse_args()
+
+    options.responses = (options.response or []) + (load_responses(options.response_file) if options.response_file else [])
+    if not options.responses:
+        options.responses = [DEFAULT_RESPONSE]
+
+    server = MockServer((options.host, options.port), options)
+    print(f"mock OpenAI server listening on http://{options.host}:{options.port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
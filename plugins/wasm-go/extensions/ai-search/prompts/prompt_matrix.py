@@ -0,0 +1,176 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from test_ai_search import (
+    DEFAULT_MODEL,
+    DEFAULT_URL,
+    build_prompt,
+    build_request,
+    create_session,
+    load_questions,
+    send_request,
+)
+
+PROMPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(PROMPTS_DIR, '.matrix_cache')
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def cache_key(template_hash, question, count, model):
+    """Cache key of one matrix cell: (template hash, question, count, model)."""
+    return sha256(json.dumps([template_hash, question, str(count), model], ensure_ascii=False))
+
+
+def load_cached(cache_dir, key):
+    path = os.path.join(cache_dir, key + '.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_cached(cache_dir, key, record):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key + '.json')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def expand_jobs(prompt_files, questions, counts, model):
+    """Expand prompts x questions x max_count values into matrix jobs."""
+    jobs = []
+    for prompt_file in prompt_files:
+        with open(prompt_file, 'r', encoding='utf-8') as f:
+            template = f.read()
+        template_hash = sha256(template)
+        for question in questions:
+            for count in counts:
+                jobs.append({
+                    'prompt': os.path.basename(prompt_file),
+                    'question': question,
+                    'count': count,
+                    'template': template,
+                    'key': cache_key(template_hash, question, count, model),
+                })
+    return jobs
+
+
+def run_matrix(args, jobs):
+    """Run the cells missing from the cache in parallel over one connection pool."""
+    results = {}
+    pending = []
+    for job in jobs:
+        cached = None if args.refresh else load_cached(args.cache_dir, job['key'])
+        if cached is not None:
+            results[job['key']] = dict(cached, cached=True)
+        else:
+            pending.append(job)
+
+    print(f"{len(jobs)} cells, {len(jobs) - len(pending)} cached, {len(pending)} to run")
+    if not pending:
+        return results
+
+    session = create_session(args.concurrency)
+
+    def run(job):
+        data = build_request(build_prompt(job['template'], job['question'], job['count']), args.model)
+        record = send_request(session, args.url, data, args.timeout)
+        if record['ok']:
+            save_cached(args.cache_dir, job['key'], record)
+        return job['key'], dict(record, cached=False)
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for key, record in executor.map(run, pending):
+            results[key] = record
+    session.close()
+    print(f"Ran {len(pending)} cells in {time.perf_counter() - start_time:.2f} seconds")
+    return results
+
+
+def shorten(text, width):
+    text = ' '.join((text or '').split())
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+
+def print_table(jobs, results):
+    header = ['prompt', 'count', 'question', 'latency', 'prompt_tok', 'compl_tok', 'cached', 'decision']
+    rows = []
+    for job in jobs:
+        record = results[job['key']]
+        usage = record.get('usage') or {}
+        decision = record['content'] if record['ok'] else f"ERROR: {record['error']}"
+        rows.append([
+            job['prompt'],
+            str(job['count']),
+            shorten(job['question'], 30),
+            f"{record['latency']:.2f}s",
+            str(usage.get('prompt_tokens', '-')),
+            str(usage.get('completion_tokens', '-')),
+            'yes' if record['cached'] else 'no',
+            shorten(decision, 60),
+        ])
+    widths = [max(len(row[i]) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI Search Prompt Matrix Benchmark')
+    parser.add_argument('--prompts', nargs='+',
+                        help='Prompt files to compare, defaults to every *.md in the prompts directory')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--question', action='append', help='A question to analyze, may be repeated')
+    source.add_argument('--questions', help='Question corpus, one per line or JSONL')
+    parser.add_argument('--counts', nargs='+', default=['3'], help='The max search count values')
+    parser.add_argument('--url', default=DEFAULT_URL, help='The chat completions endpoint')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='The model name')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout in seconds')
+    parser.add_argument('--concurrency', type=int, default=4, help='Cells run in parallel')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Directory of cached cell results')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached results and re-run every cell')
+    parser.add_argument('--report', help='Write the matrix results as JSON to this file')
+    args = parser.parse_args()
+
+    prompt_files = args.prompts or sorted(glob.glob(os.path.join(PROMPTS_DIR, '*.md')))
+    questions = args.question or load_questions(args.questions)
+    if not prompt_files or not questions:
+        parser.error('no prompts or questions to run')
+
+    jobs = expand_jobs(prompt_files, questions, args.counts, args.model)
+    results = run_matrix(args, jobs)
+    print_table(jobs, results)
+
+    if args.report:
+        report = []
+        for job in jobs:
+            record = results[job['key']]
+            report.append({
+                'prompt': job['prompt'],
+                'question': job['question'],
+                'count': job['count'],
+                'model': args.model,
+                'ok': record['ok'],
+                'cached': record['cached'],
+                'latency': record['latency'],
+                'usage': record.get('usage'),
+                'decision': record.get('content'),
+                'error': record['error'],
+            })
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,30 +2,23 @@ import argparse
 import requests
 import time
 import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
-def main():
-    # 解析命令行参数
-    parser = argparse.ArgumentParser(description='AI Search Test Script')
-    parser.add_argument('--question', required=True, help='The question to analyze')
-    parser.add_argument('--prompt', required=True, help='The prompt file to analyze')
-    parser.add_argument('--count', required=True, help='The max search count')
-    args = parser.parse_args()
+DEFAULT_URL = 'http://localhost:8080/v1/chat/completions'
+DEFAULT_MODEL = 'deepseek-v3'
 
-    # 读取并解析prompts.md模板
-    # 这里假设prompts.md已经复制到当前目录
-    with open(args.prompt, 'r', encoding='utf-8') as f:
-        prompt_template = f.read()
-    
-    # 替换模板中的{question}变量
-    prompt = prompt_template.replace('{question}', args.question)
-    prompt = prompt_template.replace('{max_count}', args.count)
-
-    # 准备请求数据
-    headers = {
-        'Content-Type': 'application/json',
-    }
-    data = {
-        "model": "deepseek-v3",
+
+def build_prompt(prompt_template, question, count):
+    """Substitute {question} and {max_count} in the prompt template."""
+    prompt = prompt_template.replace('{question}', question)
+    return prompt.replace('{max_count}', str(count))
+
+
+def build_request(prompt, model):
+    return {
+        "model": model,
         "max_tokens": 4096,
         "messages": [
             {
@@ -35,24 +28,276 @@ def main():
         ]
     }
 
-    # 发送请求并计时
-    start_time = time.time()
+
+def load_questions(path):
+    """Load a question corpus: one question per line, or JSONL with a "question" field."""
+    questions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                questions.append(json.loads(line)['question'])
+            else:
+                questions.append(line)
+    return questions
+
+
+def create_session(pool_size):
+    """Create a keep-alive session whose connection pool fits the concurrency."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Content-Type': 'application/json'})
+    return session
+
+
+def send_request(session, url, data, timeout):
+    """Send one chat completion request and return a result record."""
+    record = {'ok': False, 'status': None, 'latency': None, 'error': None}
+    start_time = time.perf_counter()
     try:
-        response = requests.post(
-            'http://localhost:8080/v1/chat/completions', 
-            headers=headers,
-            data=json.dumps(data)
-        )
+        response = session.post(url, data=json.dumps(data), timeout=timeout)
+        record['status'] = response.status_code
         response.raise_for_status()
-        end_time = time.time()
-
-        # 处理响应
         result = response.json()
+        record['content'] = result['choices'][0]['message']['content']
+        record['usage'] = result.get('usage')
+        record['ok'] = True
+    except (requests.exceptions.RequestException, ValueError, KeyError, IndexError) as e:
+        record['error'] = str(e)
+    record['latency'] = time.perf_counter() - start_time
+    return record
+
+
+def send_stream_request(session, url, data, timeout):
+    """Send one streaming chat completion request and time the SSE chunks as they arrive."""
+    record = {'ok': False, 'status': None, 'latency': None, 'error': None,
+              'ttft': None, 'chunks': 0, 'tokens': 0, 'tokens_per_sec': None, 'gaps': []}
+    data = dict(data, stream=True, stream_options={'include_usage': True})
+    content = []
+    usage_tokens = None
+    start_time = time.perf_counter()
+    last_time = None
+    try:
+        with session.post(url, data=json.dumps(data), timeout=timeout, stream=True) as response:
+            record['status'] = response.status_code
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=False):
+                if not line.startswith(b'data:'):
+                    continue
+                payload = line[5:].strip()
+                if payload == b'[DONE]':
+                    break
+                chunk = json.loads(payload)
+                if chunk.get('usage'):
+                    usage_tokens = chunk['usage'].get('completion_tokens')
+                delta = chunk['choices'][0].get('delta', {}).get('content') if chunk.get('choices') else None
+                if not delta:
+                    continue
+                now = time.perf_counter()
+                if last_time is None:
+                    record['ttft'] = now - start_time
+                else:
+                    record['gaps'].append(now - last_time)
+                last_time = now
+                record['chunks'] += 1
+                content.append(delta)
+        record['content'] = ''.join(content)
+        record['ok'] = True
+    except (requests.exceptions.RequestException, ValueError, KeyError, IndexError) as e:
+        record['error'] = str(e)
+    record['latency'] = time.perf_counter() - start_time
+    # 优先使用服务端返回的usage，否则以内容分片数近似token数
+    record['tokens'] = usage_tokens if usage_tokens is not None else record['chunks']
+    if record['ttft'] is not None and record['latency'] > record['ttft']:
+        record['tokens_per_sec'] = record['tokens'] / (record['latency'] - record['ttft'])
+    return record
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an unsorted list, None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def distribution(values):
+    return {
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None,
+    }
+
+
+def summarize(records, elapsed):
+    latencies = [r['latency'] for r in records if r['ok']]
+    errors = [r for r in records if not r['ok']]
+    total = len(records)
+    summary = {
+        'requests': total,
+        'errors': len(errors),
+        'error_rate': len(errors) / total if total else 0.0,
+        'elapsed': elapsed,
+        'request_rate': total / elapsed if elapsed > 0 else 0.0,
+        'success_rate': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'latency': distribution(latencies),
+    }
+    starts = sorted(r['started'] for r in records if 'started' in r)
+    if len(starts) > 1 and starts[-1] > starts[0]:
+        summary['achieved_rps'] = (len(starts) - 1) / (starts[-1] - starts[0])
+    queue_delays = [r['queue_delay'] for r in records if 'queue_delay' in r]
+    if queue_delays:
+        summary['queue_delay'] = distribution(queue_delays)
+    streamed = [r for r in records if r['ok'] and 'ttft' in r]
+    if streamed:
+        rates = [r['tokens_per_sec'] for r in streamed if r['tokens_per_sec'] is not None]
+        summary['ttft'] = distribution([r['ttft'] for r in streamed if r['ttft'] is not None])
+        summary['inter_chunk'] = distribution([gap for r in streamed for gap in r['gaps']])
+        summary['tokens_per_sec'] = sum(rates) / len(rates) if rates else None
+    return summary
+
+
+def format_distribution(name, dist):
+    return (f"{name} p50={dist['p50']:.3f}s p90={dist['p90']:.3f}s "
+            f"p99={dist['p99']:.3f}s max={dist['max']:.3f}s")
+
+
+def run_load(args, prompt_template, questions):
+    """Replay the question corpus at the requested concurrency or RPS."""
+    total = args.requests or len(questions)
+    workers = args.concurrency
+    if args.rps:
+        # 线程随在途请求数按需创建，--max-workers 为上限，超出部分排队并计入 queue delay
+        workers = max(workers, min(total, args.max_workers))
+    session = create_session(workers)
+    start_time = time.perf_counter()
+    send = send_stream_request if args.stream else send_request
+
+    def job(index, slot=None):
+        question = questions[index % len(questions)]
+        data = build_request(build_prompt(prompt_template, question, args.count), args.model)
+        send_start = time.perf_counter()
+        record = send(session, args.url, data, args.timeout)
+        if slot is not None:
+            # 从计划发送时刻计算延迟，排队时间计入结果，避免coordinated omission
+            record['queue_delay'] = max(0.0, send_start - slot)
+            record['latency'] += record['queue_delay']
+        record['started'] = send_start - start_time
+        record['question'] = question
+        record.pop('content', None)
+        return record
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if args.rps:
+            # 按计划时刻逐个提交，而不是预先创建线程等待发送时刻
+            futures = []
+            for index in range(total):
+                slot = start_time + index / args.rps
+                delay = slot - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(executor.submit(job, index, slot))
+            records = [future.result() for future in futures]
+        else:
+            records = list(executor.map(job, range(total)))
+    elapsed = time.perf_counter() - start_time
+    session.close()
+
+    summary = summarize(records, elapsed)
+    print(f"Requests: {summary['requests']}, errors: {summary['errors']} "
+          f"({summary['error_rate']:.2%}), elapsed: {elapsed:.2f}s, "
+          f"requests/s: {summary['request_rate']:.2f}, successes/s: {summary['success_rate']:.2f}")
+    if args.rps:
+        achieved = summary.get('achieved_rps', 0.0)
+        print(f"Target rate: {args.rps:.2f} req/s, achieved send rate: {achieved:.2f} req/s")
+        if achieved < args.rps * 0.95:
+            print(f"Warning: achieved rate is below the target rate "
+                  f"(at most {workers} workers, see queue delay and --max-workers)")
+    for name, key in (('Latency', 'latency'), ('Queue delay', 'queue_delay'),
+                      ('TTFT', 'ttft'), ('Inter-chunk', 'inter_chunk')):
+        if key in summary and summary[key]['max'] is not None:
+            print(format_distribution(name, summary[key]))
+    if summary.get('tokens_per_sec') is not None:
+        print(f"Tokens/sec (mean per request): {summary['tokens_per_sec']:.1f}")
+
+    if args.report:
+        report = {
+            'config': {
+                'url': args.url,
+                'model': args.model,
+                'prompt': args.prompt,
+                'count': args.count,
+                'concurrency': args.concurrency,
+                'rps': args.rps,
+                'workers': workers,
+                'stream': args.stream,
+            },
+            'summary': summary,
+            'requests': records,
+        }
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written to {args.report}")
+
+
+def main():
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description='AI Search Test Script')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--question', help='The question to analyze')
+    source.add_argument('--questions', help='Question corpus for load mode, one per line or JSONL')
+    parser.add_argument('--prompt', required=True, help='The prompt file to analyze')
+    parser.add_argument('--count', required=True, help='The max search count')
+    parser.add_argument('--url', default=DEFAULT_URL, help='The chat completions endpoint')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='The model name')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout in seconds')
+    parser.add_argument('--concurrency', type=int, default=1, help='Concurrent requests in load mode')
+    parser.add_argument('--rps', type=float, help='Target requests per second in load mode')
+    parser.add_argument('--max-workers', type=int, default=256,
+                        help='Upper bound on concurrent requests in --rps mode, later requests queue')
+    parser.add_argument('--requests', type=int, help='Total requests in load mode, defaults to the corpus size')
+    parser.add_argument('--stream', action='store_true', help='Use SSE streaming and measure time-to-first-token')
+    parser.add_argument('--report', help='Write a JSON report of the load run to this file')
+    args = parser.parse_args()
+
+    # 读取并解析prompts.md模板
+    # 这里假设prompts.md已经复制到当前目录
+    with open(args.prompt, 'r', encoding='utf-8') as f:
+        prompt_template = f.read()
+
+    if args.questions:
+        questions = load_questions(args.questions)
+        if not questions:
+            parser.error(f"no questions found in {args.questions}")
+        run_load(args, prompt_template, questions)
+        return
+
+    # 替换模板中的{question}和{max_count}变量
+    data = build_request(build_prompt(prompt_template, args.question, args.count), args.model)
+
+    # 发送请求并计时
+    session = create_session(1)
+    send = send_stream_request if args.stream else send_request
+    record = send(session, args.url, data, args.timeout)
+    if record['ok']:
         print("Response:")
-        print(result['choices'][0]['message']['content'])
-        print(f"\nRequest took {end_time - start_time:.2f} seconds")
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
+        print(record['content'])
+        print(f"\nRequest took {record['latency']:.2f} seconds")
+        if args.stream and record['ttft'] is not None:
+            gaps = record['gaps']
+            print(f"Time to first token: {record['ttft']:.3f} seconds")
+            print(f"Chunks: {record['chunks']}, tokens: {record['tokens']}, "
+                  f"mean inter-chunk gap: {(sum(gaps) / len(gaps) if gaps else 0):.3f} seconds")
+            if record['tokens_per_sec'] is not None:
+                print(f"Tokens/sec: {record['tokens_per_sec']:.1f}")
+    else:
+        print(f"Request failed: {record['error']}")
 
 if __name__ == '__main__':
     main()
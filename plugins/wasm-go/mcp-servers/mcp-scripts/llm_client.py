@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Shared chat-completions client for the mcp-scripts tools.
+
+Keeps connections alive across calls, retries 429/5xx and network errors with
+jittered exponential backoff (honoring Retry-After), throttles requests and
+tokens per minute on the client side, and can log one JSON line per call.
+"""
+import sys
+import json
+import time
+import random
+import threading
+import email.utils
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "127.0.0.1:8080/v1"
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """Raised when a chat completion fails after all retries."""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to `per_minute` units."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount):
+        """Block until `amount` units are available, then take them."""
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            time.sleep(wait)
+
+    def adjust(self, amount):
+        """Correct an earlier estimate; a negative balance delays later callers."""
+        with self.lock:
+            self._refill()
+            self.available = min(self.capacity, self.available - amount)
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """Rough upper bound of the tokens a request will use, before usage is known."""
+    chars = sum(len(message.get("content") or "") for message in messages)
+    # Chinese text runs close to one token per character, English about four characters per token
+    return chars // 2 + (max_tokens or 1024)
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    def __init__(self, base_url=DEFAULT_BASE_URL, connect_timeout=10.0, read_timeout=300.0,
+                 max_retries=5, backoff_base=1.0, backoff_max=60.0, rpm=None, tpm=None,
+                 metrics_file=None, pool_size=32):
+        if "://" not in base_url:
+            base_url = "http://" + base_url
+        base_url = base_url.rstrip("/")
+        self.url = base_url if base_url.endswith("/chat/completions") else base_url + "/chat/completions"
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.metrics_lock = threading.Lock()
+        self.metrics = None
+        if metrics_file == "-":
+            self.metrics = sys.stderr
+        elif metrics_file:
+            self.metrics = open(metrics_file, "a", encoding="utf-8")
+
+    def close(self):
+        self.session.close()
+        if self.metrics not in (None, sys.stderr):
+            self.metrics.close()
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def emit(self, **record):
+        if self.metrics is None:
+            return
+        line = json.dumps(dict(record, ts=time.time()), ensure_ascii=False)
+        with self.metrics_lock:
+            self.metrics.write(line + "\n")
+            self.metrics.flush()
+
+    def chat(self, messages, model, **params):
+        """Send a chat completion and return the content of the first choice."""
+        data = dict(params, model=model, messages=messages)
+        estimate = estimate_tokens(messages, params.get("max_tokens"))
+        if self.request_bucket:
+            self.request_bucket.acquire(1)
+        if self.token_bucket:
+            self.token_bucket.acquire(estimate)
+
+        start_time = time.perf_counter()
+        attempt = 0
+        while True:
+            status, error, retry_after = None, None, None
+            try:
+                response = self.session.post(self.url, json=data, timeout=self.timeout)
+                status = response.status_code
+                if status not in RETRY_STATUS:
+                    response.raise_for_status()
+                    result = response.json()
+                    break
+                error = f"HTTP {status}"
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = str(e)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                self.emit(model=model, status=status, attempts=attempt + 1,
+                          latency=time.perf_counter() - start_time, error=str(e))
+                raise LLMError(f"Error calling OpenAI API: {e}") from e
+
+            if attempt >= self.max_retries:
+                self.emit(model=model, status=status, attempts=attempt + 1,
+                          latency=time.perf_counter() - start_time, error=error)
+                raise LLMError(f"Error calling OpenAI API: {error} after {attempt + 1} attempt(s)")
+            time.sleep(self.backoff(attempt, retry_after))
+            attempt += 1
+            # A retry resends the whole prompt, so it is charged a request and the token
+            # estimate again; only the last attempt is corrected from the reported usage
+            if self.request_bucket:
+                self.request_bucket.acquire(1)
+            if self.token_bucket:
+                self.token_bucket.acquire(estimate)
+
+        usage = result.get("usage") or {}
+        if self.token_bucket and usage.get("total_tokens") is not None:
+            self.token_bucket.adjust(usage["total_tokens"] - estimate)
+        self.emit(model=model, status=status, attempts=attempt + 1,
+                  latency=time.perf_counter() - start_time,
+                  prompt_tokens=usage.get("prompt_tokens"),
+                  completion_tokens=usage.get("completion_tokens"),
+                  total_tokens=usage.get("total_tokens"))
+
+        if "choices" in result and len(result["choices"]) > 0:
+            return result["choices"][0]["message"]["content"]
+        raise LLMError("Error: Unexpected API response format")
+
+
+def add_client_arguments(parser):
+    """Add the shared connection, retry and rate limit options to an argparse parser."""
+    group = parser.add_argument_group("LLM client")
+    group.add_argument("--base-url", default=DEFAULT_BASE_URL, help=f"API base URL, http:// is assumed without a scheme (default: {DEFAULT_BASE_URL})")
+    group.add_argument("--connect-timeout", type=float, default=10.0, help="Connect timeout in seconds")
+    group.add_argument("--read-timeout", type=float, default=300.0, help="Read timeout in seconds")
+    group.add_argument("--max-retries", type=int, default=5, help="Retries on 429, 5xx and network errors")
+    group.add_argument("--rpm", type=float, help="Client-side limit of requests per minute")
+    group.add_argument("--tpm", type=float, help="Client-side limit of tokens per minute")
+    group.add_argument("--metrics-file", help="Append per-call metrics as JSON lines to this file ('-' for stderr)")
+
+
+def client_from_args(args, pool_size=32):
+    return LLMClient(
+        base_url=args.base_url,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        max_retries=args.max_retries,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        metrics_file=args.metrics_file,
+        pool_size=pool_size,
+    )
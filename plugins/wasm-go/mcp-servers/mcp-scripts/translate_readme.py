@@ -1,8 +1,28 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import json
-import requests
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from llm_client import LLMError, add_client_arguments, client_from_args
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MANIFEST = os.path.join(SCRIPT_DIR, "translate_manifest.json")
+DEFAULT_CACHE = os.path.join(SCRIPT_DIR, ".translate_cache.json")
+SOURCE_NAME = "README_ZH.md"
+TARGET_NAME = "README.md"
+MODEL = "gpt-4o"
+
+CJK_RE = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+HEADING_RE = re.compile(r'^#{1,6}\s')
+FENCE_RE = re.compile(r'^\s*(`{3,}|~{3,})')
+INLINE_CODE_RE = re.compile(r'(`+)[^`\n]+?\1')
+PLACEHOLDER = "@@CODE{}@@"
+PLACEHOLDER_RE = re.compile(r'@@CODE(\d+)@@')
 
 def read_file(file_path):
     """Read file and return its content as a string."""
@@ -13,47 +33,27 @@ def read_file(file_path):
         print(f"Error reading file: {e}")
         sys.exit(1)
 
-def call_openai_api(content, base_url):
-    """Call OpenAI API to translate content from Chinese to English."""
-    url = f"http://{base_url}/chat/completions"
-    
+def call_openai_api(content, client):
+    """Call OpenAI API to translate content from Chinese to English.
+
+    Raises LLMError on failure so batch runs can carry on with other files.
+    """
     # Prepare the prompt for OpenAI
     prompt = f"""
-请将以下中文文档翻译成英文。保持原始的Markdown格式，包括标题、列表、代码块等。
+请将以下中文文档片段翻译成英文。保持原始的Markdown格式，包括标题、列表、表格等。
 确保翻译准确、专业，并且保持技术术语的正确性。
+文中形如 @@CODE0@@ 的占位符代表代码，必须原样保留，不要增删或修改。只输出译文，不要添加任何解释。
 
-以下是需要翻译的中文文档：
+以下是需要翻译的中文文档片段：
 
 {content}
 """
-    
-    # Prepare the API request
-    headers = {
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "model": "gpt-4o",
-        "messages": [
-            {"role": "system", "content": "你是一个专业的技术文档翻译助手，擅长将中文技术文档翻译成英文。"},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.3
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        
-        result = response.json()
-        if "choices" in result and len(result["choices"]) > 0:
-            return result["choices"][0]["message"]["content"]
-        else:
-            print("Error: Unexpected API response format")
-            sys.exit(1)
-    except Exception as e:
-        print(f"Error calling OpenAI API: {e}")
-        sys.exit(1)
+
+    messages = [
+        {"role": "system", "content": "你是一个专业的技术文档翻译助手，擅长将中文技术文档翻译成英文。"},
+        {"role": "user", "content": prompt}
+    ]
+    return client.chat(messages, MODEL, temperature=0.3)
 
 def save_markdown(markdown_content, output_file):
     """Save the Markdown content to a file."""
@@ -64,24 +64,279 @@ def save_markdown(markdown_content, output_file):
         print(f"Error saving Markdown file: {e}")
         sys.exit(1)
 
+def fence_marker(line):
+    match = FENCE_RE.match(line)
+    return match.group(1) if match else None
+
+def closes_fence(line, fence):
+    marker = fence_marker(line)
+    return marker is not None and marker[0] == fence[0] and len(marker) >= len(fence) \
+        and line.strip() == marker
+
+def split_sections(markdown, max_chars):
+    """Split Markdown at heading boundaries, never inside a code fence.
+
+    Sections longer than max_chars are further split at blank lines.
+    """
+    sections, current, size, fence = [], [], 0, None
+    for line in markdown.splitlines(keepends=True):
+        if fence is None and current and HEADING_RE.match(line):
+            sections.append(''.join(current))
+            current, size = [], 0
+        if fence is None:
+            fence = fence_marker(line)
+        elif closes_fence(line, fence):
+            fence = None
+        current.append(line)
+        size += len(line)
+        if fence is None and size > max_chars and not line.strip():
+            sections.append(''.join(current))
+            current, size = [], 0
+    if current:
+        sections.append(''.join(current))
+    return sections
+
+def protect(text):
+    """Replace code fences, inline code and identifier-only table rows with placeholders."""
+    originals = []
+
+    def keep(original):
+        originals.append(original)
+        return PLACEHOLDER.format(len(originals) - 1)
+
+    out, block, fence = [], [], None
+    for line in text.splitlines(keepends=True):
+        if fence is not None:
+            block.append(line)
+            if closes_fence(line, fence):
+                body = ''.join(block)
+                out.append(keep(body.rstrip('\n')) + body[len(body.rstrip('\n')):])
+                block, fence = [], None
+            continue
+        fence = fence_marker(line)
+        if fence is not None:
+            block.append(line)
+        elif line.lstrip().startswith('|') and not CJK_RE.search(line):
+            stripped = line.rstrip('\n')
+            out.append(keep(stripped) + line[len(stripped):])
+        else:
+            out.append(INLINE_CODE_RE.sub(lambda m: keep(m.group(0)), line))
+    if block:
+        out.append(keep(''.join(block)))
+    return ''.join(out), originals
+
+def restore(text, originals):
+    """Put the protected snippets back, failing if the model dropped any placeholder."""
+    found = PLACEHOLDER_RE.findall(text)
+    if sorted(int(index) for index in found) != list(range(len(originals))):
+        raise LLMError("Error: translation did not preserve code placeholders")
+    return PLACEHOLDER_RE.sub(lambda m: originals[int(m.group(1))], text)
+
+def strip_wrapping_fence(text):
+    """Drop a ```markdown fence the model sometimes wraps around its answer."""
+    lines = text.strip().splitlines()
+    if len(lines) >= 2 and lines[0].startswith("```") and lines[-1].strip() == "```":
+        return "\n".join(lines[1:-1])
+    return text.strip()
+
+class ChunkCache:
+    """On-disk cache of translated chunks keyed by the hash of the protected source."""
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+        self.entries = {}
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with self.lock:
+            tmp_file = self.cache_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+
+def translate_chunk(chunk, client, cache):
+    """Translate one section and return (text, outcome).
+
+    The model is skipped when there is nothing Chinese left to translate. A
+    translation that loses a placeholder is retried once before failing.
+    """
+    protected, originals = protect(chunk)
+    body = protected.strip()
+    if not CJK_RE.search(body):
+        return chunk, "skipped"
+    key = content_hash(MODEL + "\0" + body)
+    translated = cache.get(key)
+    outcome = "cached"
+    if translated is None:
+        outcome = "translated"
+        for attempt in range(2):
+            translated = strip_wrapping_fence(call_openai_api(body, client))
+            try:
+                restore(translated, originals)
+                break
+            except LLMError:
+                if attempt:
+                    raise
+        cache.put(key, translated)
+    leading = protected[:len(protected) - len(protected.lstrip())]
+    trailing = protected[len(protected.rstrip()):]
+    return restore(leading + translated + trailing, originals), outcome
+
+def translate_document(content, client, executor, cache, max_chars):
+    """Translate the sections of a document concurrently and reassemble them in order."""
+    futures = [executor.submit(translate_chunk, chunk, client, cache)
+               for chunk in split_sections(content, max_chars)]
+    stats = {"translated": 0, "cached": 0, "skipped": 0}
+    parts = []
+    for future in futures:
+        text, outcome = future.result()
+        parts.append(text)
+        stats[outcome] += 1
+    return "".join(parts), stats
+
+def format_stats(stats):
+    return f"{stats['translated']} translated, {stats['cached']} cached, {stats['skipped']} skipped chunk(s)"
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def load_manifest(manifest_file):
+    """Load the {source path: content hash} manifest of translated files."""
+    if not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def save_manifest(manifest, manifest_file):
+    tmp_file = manifest_file + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2, sort_keys=True)
+        file.write("\n")
+    os.replace(tmp_file, manifest_file)
+
+def discover_pairs(root_dir):
+    """Find every server directory under root_dir holding a README_ZH.md."""
+    pairs = []
+    for name in sorted(os.listdir(root_dir)):
+        source = os.path.join(root_dir, name, SOURCE_NAME)
+        if os.path.isfile(source):
+            pairs.append((source, os.path.join(root_dir, name, TARGET_NAME)))
+    return pairs
+
+def run_batch(args, client):
+    """Translate every README_ZH.md whose content changed since the last run."""
+    root_dir = os.path.abspath(args.batch)
+    manifest = load_manifest(args.manifest)
+    jobs = []
+    for source, target in discover_pairs(root_dir):
+        key = os.path.relpath(source, root_dir)
+        content = read_file(source)
+        digest = content_hash(content)
+        if not args.force and manifest.get(key) == digest and os.path.exists(target):
+            continue
+        jobs.append((key, content, digest, target))
+
+    if args.mark_current:
+        for key, _, digest, _ in jobs:
+            manifest[key] = digest
+        save_manifest(manifest, args.manifest)
+        print(f"Recorded {len(jobs)} source hashes in {args.manifest}")
+        return 0
+
+    if not jobs:
+        print("All translations are up to date")
+        return 0
+
+    print(f"Translating {len(jobs)} file(s) with {args.workers} worker(s)")
+    lock = threading.Lock()
+    cache = ChunkCache(args.cache)
+    chunk_executor = ThreadPoolExecutor(max_workers=args.chunk_workers)
+    start_time = time.time()
+
+    def translate(job):
+        key, content, digest, target = job
+        english_content, stats = translate_document(content, client, chunk_executor, cache, args.max_chars)
+        save_markdown(english_content, target)
+        # Record progress as soon as a file is done so an interrupted run resumes here
+        with lock:
+            manifest[key] = digest
+            save_manifest(manifest, args.manifest)
+        cache.save()
+        return stats
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(translate, job): job[0] for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            key = futures[future]
+            error = future.exception()
+            if error is None:
+                status = f"ok ({format_stats(future.result())})"
+            else:
+                status = f"failed: {error}"
+                failed += 1
+            print(f"[{done}/{len(jobs)}] {time.time() - start_time:6.1f}s {key} {status}", flush=True)
+    chunk_executor.shutdown()
+    cache.save()
+
+    print(f"Done: {len(jobs) - failed} translated, {failed} failed")
+    return 1 if failed else 0
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python translate_readme.py <input_file_path> [output_file_path]")
+    parser = argparse.ArgumentParser(description="Translate MCP server READMEs from Chinese to English.")
+    parser.add_argument("input_file", nargs="?", help="Chinese README to translate")
+    parser.add_argument("output_file", nargs="?", default="README.md", help="Output file (default: README.md)")
+    parser.add_argument("--batch", metavar="DIR",
+                        help="Translate every */README_ZH.md under DIR to README.md when its source changed")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent translations in batch mode")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="Source hash manifest used in batch mode")
+    parser.add_argument("--chunk-workers", type=int, default=8, help="Concurrent chunk translations")
+    parser.add_argument("--max-chars", type=int, default=4000, help="Split sections longer than this at blank lines")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Per-chunk translation cache file")
+    parser.add_argument("--force", action="store_true", help="Translate every file regardless of the manifest")
+    parser.add_argument("--mark-current", action="store_true",
+                        help="Record the current source hashes in the manifest without translating")
+    add_client_arguments(parser)
+    args = parser.parse_args()
+    client = client_from_args(args, pool_size=args.chunk_workers)
+
+    if args.batch:
+        sys.exit(run_batch(args, client))
+
+    if not args.input_file:
+        parser.print_usage()
         sys.exit(1)
-    
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else "README.md"
-    base_url = "127.0.0.1:8080/v1"
-    
+
     # Read the Chinese content
-    chinese_content = read_file(input_file)
-    
-    # Translate to English
-    english_content = call_openai_api(chinese_content, base_url)
-    
+    chinese_content = read_file(args.input_file)
+
+    # Translate to English, section by section
+    cache = ChunkCache(args.cache)
+    try:
+        with ThreadPoolExecutor(max_workers=args.chunk_workers) as executor:
+            english_content, stats = translate_document(chinese_content, client, executor, cache, args.max_chars)
+    except LLMError as e:
+        print(e)
+        sys.exit(1)
+    cache.save()
+    print(format_stats(stats), file=sys.stderr)
+
     # Save the translated content
-    save_markdown(english_content, output_file)
-    
+    save_markdown(english_content, args.output_file)
+
     # Print the translated content to stdout
     print(english_content)
 
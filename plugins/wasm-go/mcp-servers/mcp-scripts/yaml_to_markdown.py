@@ -1,61 +1,70 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import json
-import requests
+import glob
+import hashlib
+import argparse
+import threading
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from llm_client import LLMError, add_client_arguments, client_from_args
 
-def read_yaml_file(file_path):
-    """Read YAML file and return its content as a string."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    except Exception as e:
-        print(f"Error reading YAML file: {e}")
-        sys.exit(1)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE = os.path.join(SCRIPT_DIR, ".yaml_docs_cache.json")
+MODEL = "gpt-4"
+
+SERVER_PROMPT = """
+请根据以下MCP服务器的配置，编写该MCP服务器的功能简介，概述其主要功能和用途。
+只输出简介正文，不要输出标题。
 
-def call_openai_api(yaml_content, base_url):
-    """Call OpenAI API to transform YAML to Markdown."""
-    url = f"http://{base_url}/chat/completions"
-    
-    # Prepare the prompt for OpenAI
-    prompt = f"""
-请将以下MCP服务器YAML配置转换为Markdown格式的功能简介文档。
-文档应包含两个二级标题：
-1. ## 功能简介 - 概述该MCP服务器的主要功能和用途
-2. ## 工具简介 - 概括介绍每个工具的用途和使用场景
+服务器配置：
 
-以下是YAML配置内容：
+{server}
+"""
+
+TOOL_PROMPT = """
+请根据以下MCP工具的YAML配置，编写该工具的Markdown简介小节。
+小节以三级标题“### {name}”开头，概括介绍工具的用途、使用场景和主要参数。
+只输出该小节内容。
+
+以下是工具的YAML配置：
 
-{yaml_content}
+{tool}
 """
-    
-    # Prepare the API request
-    headers = {
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "model": "gpt-4",
-        "messages": [
-            {"role": "system", "content": "你是一个专业的技术文档编写助手，擅长将技术配置文件转换为易于理解的文档。"},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.7
-    }
-    
+
+OVERVIEW_HEADING = "功能简介"
+TOOLS_HEADING = "工具简介"
+HEADING_RE = re.compile(r'^#{1,2}\s')
+# Each generated section is preceded by a marker with its id and the fingerprint it was generated from
+MARKER = "<!-- mcp-doc: {} {} -->"
+MARKER_RE = re.compile(r'^<!-- mcp-doc: (\S+) ([0-9a-f]+) -->[ \t]*$', re.M)
+
+def read_yaml_file(file_path):
+    """Read YAML file and return its parsed content.
+
+    Raises ValueError so batch runs can record the file as failed and carry on.
+    """
     try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        
-        result = response.json()
-        if "choices" in result and len(result["choices"]) > 0:
-            return result["choices"][0]["message"]["content"]
-        else:
-            print("Error: Unexpected API response format")
-            sys.exit(1)
-    except Exception as e:
-        print(f"Error calling OpenAI API: {e}")
-        sys.exit(1)
+        with open(file_path, 'r', encoding='utf-8') as file:
+            config = yaml.safe_load(file) or {}
+    except (OSError, yaml.YAMLError) as e:
+        raise ValueError(f"Error reading YAML file: {e}") from e
+    if not isinstance(config, dict):
+        raise ValueError("Error reading YAML file: top level is not a mapping")
+    return config
+
+def call_openai_api(prompt, client):
+    """Call OpenAI API to write one section of the Markdown document.
+
+    Raises LLMError on failure so batch runs can carry on with other files.
+    """
+    messages = [
+        {"role": "system", "content": "你是一个专业的技术文档编写助手，擅长将技术配置文件转换为易于理解的文档。"},
+        {"role": "user", "content": prompt}
+    ]
+    return client.chat(messages, MODEL, temperature=0.7).strip()
 
 def save_markdown(markdown_content, output_file):
     """Save the Markdown content to a file."""
@@ -66,21 +75,236 @@ def save_markdown(markdown_content, output_file):
         print(f"Error saving Markdown file: {e}")
         sys.exit(1)
 
+def fingerprint(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+def dump_yaml(value):
+    return yaml.safe_dump(value, allow_unicode=True, sort_keys=False)
+
+def plan_sections(config):
+    """Describe the sections of one document as (section id, cache key, prompt) tuples.
+
+    Each key covers everything its prompt is built from. The overview is
+    written from the server block only, so adding, removing or editing a tool
+    invalidates that tool's section and nothing else.
+    """
+    server = config.get("server") or {}
+    tools = config.get("tools") or []
+    sections = [(
+        "overview:" + str(server.get("name")),
+        fingerprint({"model": MODEL, "prompt": SERVER_PROMPT, "server": server}),
+        SERVER_PROMPT.format(server=dump_yaml(server)),
+    )]
+    for tool in tools:
+        sections.append((
+            "tool:" + str(tool.get("name")),
+            fingerprint({"model": MODEL, "prompt": TOOL_PROMPT, "tool": tool}),
+            TOOL_PROMPT.format(name=tool.get("name"), tool=dump_yaml(tool)),
+        ))
+    return sections
+
+def split_document(content):
+    """Split a document written by render_document into text and marked sections.
+
+    Returns a list of (section id, key, text) items, with None for the id and
+    key of text that is not a generated section. A section runs from its
+    marker to the next marker or the next # or ## heading outside code fences,
+    and every such heading starts a new item.
+    """
+    items = [[None, None, []]]
+    fence = None
+    for line in content.splitlines():
+        stripped = line.lstrip()
+        if fence:
+            if stripped.startswith(fence):
+                fence = None
+        elif stripped.startswith("```") or stripped.startswith("~~~"):
+            fence = stripped[:3]
+        else:
+            match = MARKER_RE.match(line)
+            if match:
+                items.append([match.group(1), match.group(2), []])
+                continue
+            if HEADING_RE.match(line) and (items[-1][0] is not None or items[-1][2]):
+                items.append([None, None, []])
+        items[-1][2].append(line)
+    return [(section_id, key, "\n".join(lines).strip()) for section_id, key, lines in items]
+
+def strip_markers(content):
+    """Drop the section markers, e.g. before appending a document to a README."""
+    return re.sub(r'\n{3,}', '\n\n', MARKER_RE.sub('', content))
+
+def render_document(sections, texts, items=None):
+    """Render a document from the planned sections and their texts.
+
+    With the items of a previous version of the same document, everything in
+    it that is not a generated section is kept in place.
+    """
+    def marked(section_id, key):
+        return MARKER.format(section_id, key) + "\n" + texts[section_id]
+
+    overview = marked(*sections[0][:2])
+    tools = [marked(section_id, key) for section_id, key, _ in sections[1:]]
+    if not items:
+        parts = ["## " + OVERVIEW_HEADING, overview, "## " + TOOLS_HEADING] + tools
+        return "\n\n".join(parts) + "\n"
+
+    tool_items = [i for i, (section_id, _, _) in enumerate(items)
+                  if section_id and section_id.startswith("tool:")]
+    if tool_items:
+        anchor = tool_items[0]
+    else:
+        headings = [i for i, (section_id, _, text) in enumerate(items)
+                    if section_id is None and text.startswith("## " + TOOLS_HEADING)]
+        anchor = headings[0] + 1 if headings else len(items)
+    parts = []
+    for i, (section_id, _, text) in enumerate(items + [(None, None, "")]):
+        if i == anchor:
+            parts += tools
+        if section_id is None:
+            if text:
+                parts.append(text)
+        elif section_id.startswith("overview:"):
+            parts.append(overview)
+    return "\n\n".join(parts) + "\n"
+
+class SectionCache:
+    """On-disk cache of generated sections keyed by their YAML fingerprint."""
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+        self.entries = {}
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with self.lock:
+            tmp_file = self.cache_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as file:
+                json.dump(self.entries, file, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+
+def generate_documents(targets, client, cache, workers):
+    """Generate the documents of several (yaml file, output file) pairs.
+
+    An existing output file is split at its section markers. A section whose
+    marker carries the current fingerprint is kept as it is in the file, hand
+    edits included; any other section is regenerated. A file without the
+    overview marker of the same server (not generated by this script, or for
+    another server) is replaced as a whole. The model is only called for
+    sections that are neither kept nor cached.
+    """
+    documents = {}
+    plans = {}
+    for yaml_file, output_file in targets:
+        try:
+            sections = plan_sections(read_yaml_file(yaml_file))
+        except ValueError as e:
+            documents[yaml_file] = e
+            continue
+        items = []
+        if os.path.exists(output_file):
+            with open(output_file, 'r', encoding='utf-8') as file:
+                items = split_document(file.read())
+        existing = {section_id: (key, text) for section_id, key, text in items if section_id}
+        if sections[0][0] not in existing:
+            items = []
+        texts = {}
+        for section_id, key, _ in sections:
+            if section_id in existing and existing[section_id][0] == key:
+                texts[section_id] = existing[section_id][1]
+        plans[yaml_file] = (sections, items, texts)
+
+    prompts = {}
+    for sections, _, texts in plans.values():
+        for section_id, key, prompt in sections:
+            if section_id not in texts and cache.get(key) is None:
+                prompts[key] = prompt
+
+    errors = {}
+    if prompts:
+        print(f"Generating {len(prompts)} section(s) with {workers} worker(s)", file=sys.stderr)
+
+        def generate(item):
+            key, prompt = item
+            try:
+                cache.put(key, call_openai_api(prompt, client))
+            except LLMError as e:
+                errors[key] = e
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(generate, prompts.items()))
+
+    for yaml_file, (sections, items, texts) in plans.items():
+        failed = [key for section_id, key, _ in sections if section_id not in texts and key in errors]
+        if failed:
+            documents[yaml_file] = errors[failed[0]]
+            continue
+        for section_id, key, _ in sections:
+            texts.setdefault(section_id, cache.get(key))
+        documents[yaml_file] = render_document(sections, texts, items)
+    return documents
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python yaml_to_markdown.py <yaml_file_path> [output_file_path]")
+    parser = argparse.ArgumentParser(description="Generate MCP server docs from mcp-server.yaml.")
+    parser.add_argument("yaml_file", nargs="?", help="mcp-server.yaml to document")
+    parser.add_argument("output_file", nargs="?", default="mcp-server-docs.md",
+                        help="Output file (default: mcp-server-docs.md)")
+    parser.add_argument("--batch", metavar="DIR",
+                        help="Document every */mcp-server.yaml under DIR next to its YAML file")
+    parser.add_argument("--output-name", default="mcp-server-docs.md",
+                        help="Document file name used in batch mode")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent section generations")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Generated section cache file")
+    add_client_arguments(parser)
+    args = parser.parse_args()
+    client = client_from_args(args, pool_size=args.workers)
+    cache = SectionCache(args.cache)
+
+    if args.batch:
+        yaml_files = sorted(glob.glob(os.path.join(args.batch, "*", "mcp-server.yaml")))
+        targets = [(yaml_file, os.path.join(os.path.dirname(yaml_file), args.output_name))
+                   for yaml_file in yaml_files]
+        documents = generate_documents(targets, client, cache, args.workers)
+        failed = 0
+        for yaml_file, output_file in targets:
+            document = documents[yaml_file]
+            if isinstance(document, Exception):
+                failed += 1
+                print(f"{yaml_file}: {document}")
+                continue
+            save_markdown(document, output_file)
+        cache.save()
+        print(f"Done: {len(documents) - failed} documented, {failed} failed")
+        sys.exit(1 if failed else 0)
+
+    if not args.yaml_file:
+        parser.print_usage()
         sys.exit(1)
-    
-    yaml_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else "mcp-server-docs.md"
-    base_url = "127.0.0.1:8080/v1"
-    
-    yaml_content = read_yaml_file(yaml_file)
-    markdown_content = call_openai_api(yaml_content, base_url)
-    save_markdown(markdown_content, output_file)
-    
-    # Print the Markdown content to stdout
-    print(markdown_content)
+
+    markdown_content = generate_documents([(args.yaml_file, args.output_file)], client, cache,
+                                          args.workers)[args.yaml_file]
+    if isinstance(markdown_content, Exception):
+        cache.save()
+        print(markdown_content)
+        sys.exit(1)
+    save_markdown(markdown_content, args.output_file)
+    cache.save()
+
+    # Print the Markdown content to stdout, without the section markers
+    print(strip_markers(markdown_content))
 
 if __name__ == "__main__":
     main()